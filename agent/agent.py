@@ -1,114 +1,182 @@
 """Kairos Voice Scheduling Assistant Agent - Natural Conversational AI"""
 
 import logging
-import json
+import orjson
+import re
 import asyncio
+import calendar
+import functools
 from livekit.agents import Agent
 from livekit.agents.llm import function_tool
 from typing import Annotated, Optional
 from pydantic import Field
 import os
 from dotenv import load_dotenv
-from supabase import create_client, Client
-from datetime import datetime, timedelta
+from supabase import AsyncClient, AsyncClientOptions
+from datetime import datetime, timedelta, timezone
 
 load_dotenv()
 
 logger = logging.getLogger("kairos-agent")
 
+def _create_supabase() -> Optional[AsyncClient]:
+    """Create a Supabase client for the current session, or None if credentials are not set.
+    
+    The async client's httpx pool is tied to the event loop that first uses it,
+    and LiveKit runs each job on a fresh loop, so clients are never shared
+    across sessions.
+    """
+    supabase_url = os.getenv("SUPABASE_URL")
+    supabase_key = os.getenv("SUPABASE_KEY")
+    
+    if not (supabase_url and supabase_key):
+        logger.warning("[KairosAgent] Supabase credentials not set")
+        return None
+    
+    # Async client so queries never block the event loop
+    client = AsyncClient(
+        supabase_url,
+        supabase_key,
+        options=AsyncClientOptions(postgrest_client_timeout=10),
+    )
+    logger.info("[KairosAgent] Supabase client initialized")
+    return client
+
+
+# Speech lookup tables, indexed by digit / day of month / 12-hour clock hour
+_DIGIT_WORDS: tuple[str, ...] = (
+    "zero", "one", "two", "three", "four",
+    "five", "six", "seven", "eight", "nine"
+)
+
+_DAY_WORDS: tuple[str, ...] = (
+    "", "first", "second", "third", "fourth", "fifth",
+    "sixth", "seventh", "eighth", "ninth", "tenth",
+    "eleventh", "twelfth", "thirteenth", "fourteenth",
+    "fifteenth", "sixteenth", "seventeenth", "eighteenth",
+    "nineteenth", "twentieth", "twenty-first", "twenty-second",
+    "twenty-third", "twenty-fourth", "twenty-fifth",
+    "twenty-sixth", "twenty-seventh", "twenty-eighth",
+    "twenty-ninth", "thirtieth", "thirty-first"
+)
+
+_HOUR_WORDS: tuple[str, ...] = (
+    "", "one", "two", "three", "four", "five", "six",
+    "seven", "eight", "nine", "ten", "eleven", "twelve"
+)
 
+_NON_DIGIT_RE = re.compile(r"\D+", re.ASCII)
+_DATE_RE = re.compile(r"^\d{4}-\d{2}-\d{2}$", re.ASCII)
+_TIME_RE = re.compile(r"^\d{2}:\d{2}$", re.ASCII)
+_ISO_DATE_RE = re.compile(r"(\d{4})-(\d{2})-(\d{2})", re.ASCII)
+_CLOCK_RE = re.compile(r"(\d{1,2}):(\d{2})", re.ASCII)
+
+
+def _digits_only(s: str) -> str:
+    """Strip everything but ASCII digits from a phone number."""
+    if s.isascii() and s.isdigit():  # Already bare digits, the common case
+        return s
+    return _NON_DIGIT_RE.sub("", s)
+
+
+def _parse_slot(date: str, time: str) -> Optional[datetime]:
+    """Parse YYYY-MM-DD and HH:MM into a datetime, or None if they are malformed."""
+    if not (_DATE_RE.match(date) and _TIME_RE.match(time)):
+        return None
+    try:
+        return datetime(
+            int(date[0:4]), int(date[5:7]), int(date[8:10]),
+            int(time[0:2]), int(time[3:5])
+        )
+    except ValueError:  # Well-formed but out of range, e.g. month 13
+        return None
+
+
+# Spoken lists of one to three items, indexed by item count
+_SLOTS_FORMATS = (
+    None,
+    lambda s: s[0],
+    lambda s: f"{s[0]} and {s[1]}",
+    lambda s: f"{s[0]}, {s[1]}, and {s[2]}",
+)
+
+
+def _speak_digits(digits: str) -> str:
+    """Speak an ASCII digit string one word per digit."""
+    return ' '.join(_DIGIT_WORDS[ord(d) - 48] for d in digits)
+
+
+@functools.lru_cache(maxsize=512)
 def format_phone_for_speech(phone: str) -> str:
     """Convert phone number to natural speech format."""
-    digits_only = ''.join(c for c in phone if c.isdigit())
-    
-    digit_words = {
-        '0': 'zero', '1': 'one', '2': 'two', '3': 'three', '4': 'four',
-        '5': 'five', '6': 'six', '7': 'seven', '8': 'eight', '9': 'nine'
-    }
+    digits_only = _digits_only(phone)
     
     if len(digits_only) == 10:
-        part1 = ' '.join(digit_words[d] for d in digits_only[:3])
-        part2 = ' '.join(digit_words[d] for d in digits_only[3:6])
-        part3 = ' '.join(digit_words[d] for d in digits_only[6:])
+        part1 = _speak_digits(digits_only[:3])
+        part2 = _speak_digits(digits_only[3:6])
+        part3 = _speak_digits(digits_only[6:])
         return f"{part1}, {part2}, {part3}"
     elif len(digits_only) == 11 and digits_only[0] == '1':
-        part1 = ' '.join(digit_words[d] for d in digits_only[1:4])
-        part2 = ' '.join(digit_words[d] for d in digits_only[4:7])
-        part3 = ' '.join(digit_words[d] for d in digits_only[7:])
+        part1 = _speak_digits(digits_only[1:4])
+        part2 = _speak_digits(digits_only[4:7])
+        part3 = _speak_digits(digits_only[7:])
         return f"one, {part1}, {part2}, {part3}"
     else:
-        return ' '.join(digit_words.get(d, d) for d in digits_only)
+        return _speak_digits(digits_only)
 
 
-def format_date_for_speech(date_str: str) -> str:
-    """Convert YYYY-MM-DD to natural speech like 'January twenty-sixth'."""
-    try:
-        dt = datetime.fromisoformat(date_str.replace('Z', '').split('T')[0])
-        day = dt.day
-        
-        if 11 <= day <= 13:
-            suffix = "th"
-        else:
-            suffix = {1: "st", 2: "nd", 3: "rd"}.get(day % 10, "th")
-        
-        day_words = {
-            1: "first", 2: "second", 3: "third", 4: "fourth", 5: "fifth",
-            6: "sixth", 7: "seventh", 8: "eighth", 9: "ninth", 10: "tenth",
-            11: "eleventh", 12: "twelfth", 13: "thirteenth", 14: "fourteenth",
-            15: "fifteenth", 16: "sixteenth", 17: "seventeenth", 18: "eighteenth",
-            19: "nineteenth", 20: "twentieth", 21: "twenty-first", 22: "twenty-second",
-            23: "twenty-third", 24: "twenty-fourth", 25: "twenty-fifth",
-            26: "twenty-sixth", 27: "twenty-seventh", 28: "twenty-eighth",
-            29: "twenty-ninth", 30: "thirtieth", 31: "thirty-first"
-        }
-        
-        day_word = day_words.get(day, f"{day}{suffix}")
-        month_name = dt.strftime("%B")
-        
-        return f"{month_name} {day_word}"
-    except:
-        return date_str
+@functools.lru_cache(maxsize=512)
+def format_date_for_speech(date_str: str, dt: Optional[datetime] = None) -> str:
+    """Convert YYYY-MM-DD to natural speech like 'January twenty-sixth'.
+    
+    Pass an already-parsed ``dt`` to skip re-parsing ``date_str``.
+    """
+    if dt is not None:
+        year, month, day = dt.year, dt.month, dt.day
+    else:
+        m = _ISO_DATE_RE.match(date_str)
+        if not m:
+            return date_str
+        year, month, day = int(m[1]), int(m[2]), int(m[3])
+        if not (1 <= month <= 12 and 1 <= day <= calendar.monthrange(year, month)[1]):
+            return date_str
+    
+    return f"{calendar.month_name[month]} {_DAY_WORDS[day]}"
 
 
-def format_time_for_speech(time_str: str) -> str:
-    """Convert HH:MM to natural speech like 'two thirty PM'."""
-    try:
-        if 'T' in time_str:
-            time_part = time_str.split('T')[1][:5]
-        else:
-            time_part = time_str[:5]
-        
-        hour, minute = map(int, time_part.split(':'))
-        
-        period = "AM" if hour < 12 else "PM"
-        if hour == 0:
-            hour = 12
-        elif hour > 12:
-            hour -= 12
-        
-        hour_words = {
-            1: "one", 2: "two", 3: "three", 4: "four", 5: "five", 6: "six",
-            7: "seven", 8: "eight", 9: "nine", 10: "ten", 11: "eleven", 12: "twelve"
-        }
-        
-        hour_word = hour_words.get(hour, str(hour))
-        
-        if minute == 0:
-            return f"{hour_word} {period}"
-        elif minute == 30:
-            return f"{hour_word} thirty {period}"
-        else:
-            return f"{hour_word} {minute:02d} {period}"
-    except:
-        return time_str
+@functools.lru_cache(maxsize=512)
+def format_time_for_speech(time_str: str, dt: Optional[datetime] = None) -> str:
+    """Convert HH:MM to natural speech like 'two thirty PM'.
+    
+    Pass an already-parsed ``dt`` to skip re-parsing ``time_str``.
+    """
+    if dt is not None:
+        hour, minute = dt.hour, dt.minute
+    else:
+        time_part = time_str.split('T')[1] if 'T' in time_str else time_str
+        m = _CLOCK_RE.match(time_part)
+        if not m:
+            return time_str
+        hour, minute = int(m[1]), int(m[2])
+    
+    period = "AM" if hour < 12 else "PM"
+    if hour == 0:
+        hour = 12
+    elif hour > 12:
+        hour -= 12
+    
+    hour_word = _HOUR_WORDS[hour] if 0 < hour <= 12 else str(hour)
+    
+    if minute == 0:
+        return f"{hour_word} {period}"
+    elif minute == 30:
+        return f"{hour_word} thirty {period}"
+    else:
+        return f"{hour_word} {minute:02d} {period}"
 
 
-class KairosAgent(Agent):
-    """Natural voice scheduling assistant with human-like conversation skills"""
-    
-    def __init__(self, room=None, participant_name=None):
-        super().__init__(
-            instructions="""You are Kairos, a friendly receptionist at a medical office. Speak naturally like a real person on the phone.
+# Kept identical across sessions so the LLM provider can reuse its cached prompt prefix
+_KAIROS_INSTRUCTIONS = """You are Kairos, a friendly receptionist at a medical office. Speak naturally like a real person on the phone.
 
 IMPORTANT RULES:
 1. Never mention any technical terms. The caller doesn't know you're an AI.
@@ -133,7 +201,15 @@ SPEAKING STYLE:
 - Use filler words: "Hmm", "Let me see", "One sec"
 
 You're a helpful receptionist. Just answer naturally!
-""",
+"""
+
+
+class KairosAgent(Agent):
+    """Natural voice scheduling assistant with human-like conversation skills"""
+    
+    def __init__(self, room=None, participant_name=None):
+        super().__init__(
+            instructions=_KAIROS_INSTRUCTIONS,
         )
         
         # Store room for data channel publishing
@@ -141,21 +217,16 @@ You're a helpful receptionist. Just answer naturally!
         self.participant_name = participant_name  # Name from frontend input
         
         # Initialize Supabase client
-        supabase_url = os.getenv("SUPABASE_URL")
-        supabase_key = os.getenv("SUPABASE_KEY")
-        
-        if supabase_url and supabase_key:
-            self.supabase: Client = create_client(supabase_url, supabase_key)
-            logger.info("[KairosAgent] Supabase client initialized")
-        else:
-            self.supabase = None
-            logger.warning("[KairosAgent] Supabase credentials not set")
+        self.supabase = _create_supabase()
         
         # Store conversation context
         self.current_user_phone = None
         self.current_user_id = None
         self.current_user_name = participant_name  # Initialize with frontend name
         self.actions_taken = []  # Track actions for summary
+        self._user_cache: dict[str, dict] = {}  # phone -> {"id", "full_name"}
+        self._background_tasks: set[asyncio.Task] = set()  # Keep fire-and-forget tasks alive
+        self._date_speech_cache: dict[int, str] = {}  # date ordinal -> spoken date
         
         logger.info(f"[KairosAgent] Initialized with participant: {participant_name}")
     
@@ -163,20 +234,51 @@ You're a helpful receptionist. Just answer naturally!
         """Publish tool call update to frontend via data channel."""
         if self.room:
             try:
-                message = json.dumps({
+                message = orjson.dumps({
                     "type": "TOOL_UPDATE",
                     "tool": tool_name,
                     "data": data,
-                    "timestamp": datetime.now().isoformat()
-                })
+                    "timestamp": datetime.now(timezone.utc)
+                }, option=orjson.OPT_UTC_Z)
                 await self.room.local_participant.publish_data(
-                    message.encode(),
+                    message,
                     topic="ui_state"
                 )
                 logger.info(f"[KairosAgent] Published tool update: {tool_name}")
             except Exception as e:
                 logger.error(f"[KairosAgent] Failed to publish tool update: {e}")
     
+    def _publish_in_background(self, tool_name: str, data: dict):
+        """Fire-and-forget a tool update so the UI publish stays off the tool's critical path."""
+        task = asyncio.create_task(self.publish_tool_update(tool_name, data))
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+    
+    def _spoken_date(self, day: datetime) -> str:
+        """Spoken form of a calendar day, formatted once per day per session."""
+        key = day.toordinal()
+        spoken = self._date_speech_cache.get(key)
+        if spoken is None:
+            spoken = format_date_for_speech(day.strftime("%Y-%m-%d"))
+            self._date_speech_cache[key] = spoken
+        return spoken
+    
+    async def _resolve_user_id(self, normalized_phone: str) -> Optional[str]:
+        """Return the user id for a phone number, hitting Supabase only on a cache miss."""
+        user = self._user_cache.get(normalized_phone)
+        if user is None:
+            user_res = await self.supabase.table("users").select("id, full_name").eq(
+                "phone_number", normalized_phone
+            ).execute()
+            if not user_res.data:
+                return None
+            user = user_res.data[0]
+            self._user_cache[normalized_phone] = user
+        
+        self.current_user_id = user.get("id")
+        self.current_user_name = user.get("full_name", "there")
+        return self.current_user_id
+    
     @function_tool()
     async def identify_user(
         self, 
@@ -186,7 +288,7 @@ You're a helpful receptionist. Just answer naturally!
         logger.info(f"[KairosAgent] identify_user called with: {phone_number}")
         
         # Extract digits only
-        digits_only = ''.join(c for c in phone_number if c.isdigit())
+        digits_only = _digits_only(phone_number)
         
         # Validate phone number length
         if len(digits_only) < 10:
@@ -195,7 +297,7 @@ You're a helpful receptionist. Just answer naturally!
         
         # Publish to UI with actual name
         display_name = self.participant_name or "User"
-        await self.publish_tool_update("identify_user", {"name": display_name, "phone": digits_only[-10:]})
+        self._publish_in_background("identify_user", {"name": display_name, "phone": digits_only[-10:]})
         
         self.current_user_phone = digits_only[-10:]  # Take last 10 digits
         
@@ -203,14 +305,9 @@ You're a helpful receptionist. Just answer naturally!
             return "Got it! How can I help you today?"
         
         try:
-            response = self.supabase.table("users").select("*").eq(
-                "phone_number", self.current_user_phone
-            ).execute()
+            user_id = await self._resolve_user_id(self.current_user_phone)
             
-            if response.data:
-                user = response.data[0]
-                self.current_user_id = user.get("id")
-                self.current_user_name = user.get("full_name", "there")
+            if user_id:
                 logger.info(f"[KairosAgent] Found user: {self.current_user_name}")
                 self.actions_taken.append(f"Identified user: {self.current_user_name}")
                 return f"Hey {self.current_user_name}! Great to hear from you. How can I help you today?"
@@ -230,7 +327,7 @@ You're a helpful receptionist. Just answer naturally!
         """Get available appointment slots for a given date."""
         logger.info(f"[KairosAgent] fetch_slots called for: {date_preference}")
         
-        await self.publish_tool_update("fetch_slots", {"date": date_preference})
+        self._publish_in_background("fetch_slots", {"date": date_preference})
         
         now = datetime.now()
         
@@ -250,13 +347,13 @@ You're a helpful receptionist. Just answer naturally!
             if not available_slots:
                 return "Unfortunately, all slots for today have passed. Would you like to check tomorrow instead?"
             
-            spoken_date = format_date_for_speech(now.strftime("%Y-%m-%d"))
-            slots_text = ", ".join(available_slots[:-1]) + f", and {available_slots[-1]}" if len(available_slots) > 1 else available_slots[0]
+            spoken_date = self._spoken_date(target_date)
+            slots_text = _SLOTS_FORMATS[len(available_slots)](available_slots)
             return f"For today, {spoken_date}, I have openings at {slots_text}. Which works for you?"
         else:
             # Tomorrow or specific date
-            tomorrow = now + timedelta(days=1)
-            spoken_date = format_date_for_speech(tomorrow.strftime("%Y-%m-%d"))
+            target_date = now + timedelta(days=1)
+            spoken_date = self._spoken_date(target_date)
             return f"For tomorrow, {spoken_date}, I have openings at ten AM, two PM, and four thirty PM. Which works for you?"
     
     @function_tool()
@@ -273,23 +370,22 @@ You're a helpful receptionist. Just answer naturally!
         spoken_time = format_time_for_speech(time)
         
         # Validate phone number
-        digits_only = ''.join(c for c in phone_number if c.isdigit())
+        digits_only = _digits_only(phone_number)
         if len(digits_only) < 10:
             return "I need your full 10-digit phone number first. What's your number?"
         
         # Validate the appointment is in the future
-        try:
-            appointment_dt = datetime.fromisoformat(f"{date}T{time}:00")
-            now = datetime.now()
-            
-            if appointment_dt <= now:
-                logger.warning(f"[KairosAgent] Past time requested: {appointment_dt} vs now {now}")
-                return f"Oops, {spoken_time} has already passed today. Would you like to book for a later time, or maybe tomorrow?"
-        except ValueError as e:
-            logger.error(f"[KairosAgent] Invalid date/time format: {e}")
+        start_dt = _parse_slot(date, time)
+        if start_dt is None:
+            logger.error(f"[KairosAgent] Invalid date/time format: {date} {time}")
             return "I didn't catch that time correctly. Could you tell me again what time works for you?"
         
-        await self.publish_tool_update("book_appointment", {
+        now = datetime.now()
+        if start_dt <= now:
+            logger.warning(f"[KairosAgent] Past time requested: {start_dt} vs now {now}")
+            return f"Oops, {spoken_time} has already passed today. Would you like to book for a later time, or maybe tomorrow?"
+        
+        self._publish_in_background("book_appointment", {
             "phone": digits_only[-10:],
             "date": date,
             "time": time
@@ -301,49 +397,28 @@ You're a helpful receptionist. Just answer naturally!
         
         try:
             normalized_phone = digits_only[-10:]  # Use validated phone
-            
-            # Find or create user
-            user_res = self.supabase.table("users").select("id, full_name").eq("phone_number", normalized_phone).execute()
-            
-            if not user_res.data:
-                # Use participant name from frontend, fallback to "Guest"
-                user_name = self.participant_name or self.current_user_name or "Guest"
-                insert_res = self.supabase.table("users").insert({
-                    "phone_number": normalized_phone,
-                    "full_name": user_name
-                }).execute()
-                
-                if insert_res.data:
-                    user_id = insert_res.data[0]["id"]
-                else:
-                    user_res = self.supabase.table("users").select("id").eq("phone_number", normalized_phone).execute()
-                    user_id = user_res.data[0]["id"]
-            else:
-                user_id = user_res.data[0]["id"]
-            
-            # Check for double-booking
-            start_dt = datetime.fromisoformat(f"{date}T{time}:00")
             end_dt = start_dt + timedelta(hours=1)
             
-            existing = self.supabase.table("appointments").select("id").eq(
-                "status", "booked"
-            ).gte("start_time", start_dt.isoformat()).lt(
-                "start_time", end_dt.isoformat()
-            ).execute()
+            # Find-or-create the user, check for double-booking and insert in one round-trip
+            user_name = self.participant_name or self.current_user_name or "Guest"
+            booking_res = await self.supabase.rpc("book_appointment_atomic", {
+                "p_phone": normalized_phone,
+                "p_name": user_name,
+                "p_start": start_dt.isoformat(),
+                "p_end": end_dt.isoformat(),
+                "p_description": "Voice Booking"
+            }).execute()
+            booking = booking_res.data
             
-            if existing.data:
-                return f"Oh, that slot at {spoken_time} is already taken. Would you like to try a different time? I have openings at ten AM and four thirty PM."
+            self._user_cache[normalized_phone] = {
+                "id": booking["user_id"],
+                "full_name": booking["full_name"]
+            }
             
-            # Create appointment
-            appt_response = self.supabase.table("appointments").insert({
-                "user_id": user_id,
-                "start_time": start_dt.isoformat(),
-                "end_time": end_dt.isoformat(),
-                "status": "booked",
-                "description": "Voice Booking"
-            }).execute()
+            if booking["conflict"]:
+                return f"Oh, that slot at {spoken_time} is already taken. Would you like to try a different time? I have openings at ten AM and four thirty PM."
             
-            if appt_response.data:
+            if booking["appointment_id"]:
                 logger.info("[KairosAgent] Appointment booked successfully")
                 self.actions_taken.append(f"Booked: {spoken_date} at {spoken_time}")
                 return f"You're all set for {spoken_date} at {spoken_time}. Anything else I can help with?"
@@ -362,24 +437,22 @@ You're a helpful receptionist. Just answer naturally!
         """Check for upcoming appointments."""
         logger.info(f"[KairosAgent] retrieve_appointments called for: {phone_number}")
         
-        await self.publish_tool_update("retrieve_appointments", {"phone": phone_number})
+        self._publish_in_background("retrieve_appointments", {"phone": phone_number})
         
         if not self.supabase:
             return "You don't have any upcoming appointments. Would you like to book one?"
         
         try:
-            normalized_phone = ''.join(c for c in phone_number if c.isdigit())
+            normalized_phone = _digits_only(phone_number)
             
-            user_res = self.supabase.table("users").select("id").eq("phone_number", normalized_phone).execute()
-            if not user_res.data:
+            user_id = await self._resolve_user_id(normalized_phone)
+            if not user_id:
                 return "I couldn't find any appointments. Would you like to book one?"
             
-            user_id = user_res.data[0]["id"]
-            
             now_iso = datetime.now().isoformat()
-            appt_res = self.supabase.table("appointments").select("*").eq(
+            appt_res = await self.supabase.table("appointments").select("start_time").eq(
                 "user_id", user_id
-            ).eq("status", "booked").gt("start_time", now_iso).order("start_time").execute()
+            ).eq("status", "booked").gt("start_time", now_iso).order("start_time").limit(3).execute()
             
             if appt_res.data:
                 appointments = []
@@ -388,8 +461,14 @@ You're a helpful receptionist. Just answer naturally!
                     if raw_start.endswith('Z'):
                         raw_start = raw_start[:-1]
                     
-                    spoken_date = format_date_for_speech(raw_start)
-                    spoken_time = format_time_for_speech(raw_start)
+                    # Parse once and share it between both formatters; on a bad
+                    # row let each formatter fall back to the raw string
+                    try:
+                        start_dt = datetime.fromisoformat(raw_start)
+                    except ValueError:
+                        start_dt = None
+                    spoken_date = format_date_for_speech(raw_start, start_dt)
+                    spoken_time = format_time_for_speech(raw_start, start_dt)
                     appointments.append(f"{spoken_date} at {spoken_time}")
                 
                 logger.info(f"[KairosAgent] Found {len(appointments)} appointments")
@@ -398,7 +477,7 @@ You're a helpful receptionist. Just answer naturally!
                 if len(appointments) == 1:
                     return f"You have one appointment: {appointments[0]}. Need to change it?"
                 else:
-                    return f"You have {len(appointments)} appointments: {', '.join(appointments)}. Anything you'd like to change?"
+                    return f"You have {len(appointments)} appointments: {_SLOTS_FORMATS[len(appointments)](appointments)}. Anything you'd like to change?"
             else:
                 return "You don't have any upcoming appointments. Want to book one?"
 
@@ -417,7 +496,7 @@ You're a helpful receptionist. Just answer naturally!
         """Reschedule an appointment."""
         logger.info(f"[KairosAgent] modify_appointment: {original_date} -> {new_date} {new_time}")
         
-        await self.publish_tool_update("modify_appointment", {
+        self._publish_in_background("modify_appointment", {
             "original_date": original_date,
             "new_date": new_date,
             "new_time": new_time
@@ -431,30 +510,32 @@ You're a helpful receptionist. Just answer naturally!
             return f"Done! Moved to {spoken_new_date} at {spoken_new_time}. Anything else?"
         
         try:
-            normalized_phone = ''.join(c for c in phone_number if c.isdigit())
+            new_start = _parse_slot(new_date, new_time)
+            if new_start is None:
+                logger.error(f"[KairosAgent] Invalid date/time format: {new_date} {new_time}")
+                return "I'm having trouble with that. What time works for you?"
             
-            user_res = self.supabase.table("users").select("id").eq("phone_number", normalized_phone).execute()
-            if not user_res.data:
-                return "I couldn't find your account. Can you confirm your phone number?"
+            normalized_phone = _digits_only(phone_number)
             
-            user_id = user_res.data[0]["id"]
+            user_id = await self._resolve_user_id(normalized_phone)
+            if not user_id:
+                return "I couldn't find your account. Can you confirm your phone number?"
             
             start_of_day = f"{original_date}T00:00:00"
             end_of_day = f"{original_date}T23:59:59"
             
-            appt_res = self.supabase.table("appointments").select("id").eq(
+            appt_res = await self.supabase.table("appointments").select("id").eq(
                 "user_id", user_id
-            ).eq("status", "booked").gte("start_time", start_of_day).lte("start_time", end_of_day).execute()
+            ).eq("status", "booked").gte("start_time", start_of_day).lte("start_time", end_of_day).limit(1).execute()
             
             if not appt_res.data:
                 return "I couldn't find that appointment. Want me to check your schedule?"
             
             appt_id = appt_res.data[0]["id"]
             
-            new_start = datetime.fromisoformat(f"{new_date}T{new_time}:00")
             new_end = new_start + timedelta(hours=1)
             
-            update_res = self.supabase.table("appointments").update({
+            update_res = await self.supabase.table("appointments").update({
                 "start_time": new_start.isoformat(),
                 "end_time": new_end.isoformat()
             }).eq("id", appt_id).execute()
@@ -479,7 +560,7 @@ You're a helpful receptionist. Just answer naturally!
         """Cancel an appointment."""
         logger.info(f"[KairosAgent] cancel_appointment: {date}")
         
-        await self.publish_tool_update("cancel_appointment", {"date": date})
+        self._publish_in_background("cancel_appointment", {"date": date})
         
         spoken_date = format_date_for_speech(date)
         
@@ -488,18 +569,16 @@ You're a helpful receptionist. Just answer naturally!
             return f"Cancelled your appointment for {spoken_date}. Anything else?"
         
         try:
-            normalized_phone = ''.join(c for c in phone_number if c.isdigit())
+            normalized_phone = _digits_only(phone_number)
             
-            user_res = self.supabase.table("users").select("id").eq("phone_number", normalized_phone).execute()
-            if not user_res.data:
+            user_id = await self._resolve_user_id(normalized_phone)
+            if not user_id:
                 return "I couldn't find that. Can you confirm the date?"
             
-            user_id = user_res.data[0]["id"]
-            
             start_of_day = f"{date}T00:00:00"
             end_of_day = f"{date}T23:59:59"
             
-            update_res = self.supabase.table("appointments").update({
+            update_res = await self.supabase.table("appointments").update({
                 "status": "cancelled"
             }).eq("user_id", user_id).gte("start_time", start_of_day).lte("start_time", end_of_day).execute()
             
@@ -528,27 +607,40 @@ You're a helpful receptionist. Just answer naturally!
         if self.actions_taken:
             full_summary = f"{summary}. Actions: {'; '.join(self.actions_taken)}"
         
+        # Publish summary to UI without holding up the goodbye
+        self._publish_in_background("end_conversation", {
+            "summary": full_summary,
+            "actions": self.actions_taken
+        })
+        
         # Save to database
         if self.supabase:
             try:
-                normalized_phone = ''.join(c for c in phone_number if c.isdigit())
-                user_res = self.supabase.table("users").select("id").eq("phone_number", normalized_phone).execute()
+                normalized_phone = _digits_only(phone_number)
                 
-                log_entry = {"summary": full_summary}
-                if user_res.data:
-                    log_entry["user_id"] = user_res.data[0]["id"]
-                
-                self.supabase.table("conversation_logs").insert(log_entry).execute()
+                if normalized_phone in self._user_cache:
+                    user_id = await self._resolve_user_id(normalized_phone)
+                    await self.supabase.table("conversation_logs").insert({"summary": full_summary, "user_id": user_id}).execute()
+                else:
+                    # Look up the user while the log is written, then link it if found.
+                    # A failed lookup only leaves the saved log unlinked.
+                    user_id, log_res = await asyncio.gather(
+                        self._resolve_user_id(normalized_phone),
+                        self.supabase.table("conversation_logs").insert({"summary": full_summary}).execute(),
+                        return_exceptions=True,
+                    )
+                    if isinstance(log_res, BaseException):
+                        raise log_res
+                    if isinstance(user_id, BaseException):
+                        logger.warning(f"[KairosAgent] Summary saved without user link: {user_id}")
+                    elif user_id and log_res.data:
+                        await self.supabase.table("conversation_logs").update({"user_id": user_id}).eq(
+                            "id", log_res.data[0]["id"]
+                        ).execute()
                 logger.info("[KairosAgent] Summary saved to database")
             except Exception as e:
                 logger.error(f"[KairosAgent] Error saving summary: {e}")
         
-        # Publish summary to UI
-        await self.publish_tool_update("end_conversation", {
-            "summary": full_summary,
-            "actions": self.actions_taken
-        })
-        
         # Build spoken summary
         if self.actions_taken:
             spoken_summary = "Just to recap what we did today: " + ", ".join(self.actions_taken) + "."
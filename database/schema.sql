@@ -22,4 +22,59 @@ create table conversation_logs (
     user_id uuid references users(id),
     summary text,
     created_at timestamp with time zone default timezone('utc'::text, now()) not null
-);
\ No newline at end of file
+);
+-- 4. Partial index so the double-booking check only scans booked slots
+create index if not exists appointments_booked_start_time_idx on appointments (start_time)
+where status = 'booked';
+-- 5. Atomic booking: find-or-create user, check for conflicts and insert in one call
+create or replace function book_appointment_atomic(
+    p_phone text,
+    p_name text,
+    p_start timestamp with time zone,
+    p_end timestamp with time zone,
+    p_description text
+) returns json language plpgsql as $$
+declare
+    v_user_id uuid;
+    v_full_name text;
+    v_appointment_id uuid;
+begin
+    -- Serialize bookings so two callers can't both see a free slot and insert;
+    -- one lock for all slots, since windows with different starts can overlap
+    perform pg_advisory_xact_lock(hashtext('book_appointment_atomic'));
+
+    insert into users (phone_number, full_name)
+    values (p_phone, p_name)
+    on conflict (phone_number) do nothing
+    returning id, full_name into v_user_id, v_full_name;
+
+    if v_user_id is null then
+        select id, full_name into v_user_id, v_full_name
+        from users where phone_number = p_phone;
+    end if;
+
+    perform 1 from appointments
+    where status = 'booked' and start_time >= p_start and start_time < p_end
+    limit 1;
+
+    if found then
+        return json_build_object(
+            'user_id', v_user_id,
+            'full_name', v_full_name,
+            'appointment_id', null,
+            'conflict', true
+        );
+    end if;
+
+    insert into appointments (user_id, start_time, end_time, status, description)
+    values (v_user_id, p_start, p_end, 'booked', p_description)
+    returning id into v_appointment_id;
+
+    return json_build_object(
+        'user_id', v_user_id,
+        'full_name', v_full_name,
+        'appointment_id', v_appointment_id,
+        'conflict', false
+    );
+end;
+$$;